@@ -1,9 +1,17 @@
+import asyncio
 from typing import Iterator, Union
 from pydantic import Field
 from llmstack.connections.models import Connection, ConnectionStatus
 from llmstack.connections.types import ConnectionTypeInterface
 from .web_login import WebLoginBaseConfiguration
 
+try:
+    from jnpr.junos import Device
+except ImportError:
+    # junos-eznc is an optional dependency, this handler is excluded from
+    # the connection types when it is not installed
+    Device = None
+
 
 class JunosLoginConfiguration(WebLoginBaseConfiguration):
     address: str = Field(
@@ -32,11 +40,14 @@ class JunosLogin(ConnectionTypeInterface[JunosLoginConfiguration]):
 
     async def activate(self, connection) -> Iterator[Union[Connection, dict]]:
         try:
-            from jnpr.junos import Device
+            if Device is None:
+                raise RuntimeError('jnpr.junos is not installed')
 
+            # PyEZ opens the NETCONF session synchronously, run it off the event loop
             device = Device(host=connection.configuration['device_address'],
-                            user=connection.configuration['username'], password=connection.configuration['password']).open()
-            device.close()
+                            user=connection.configuration['username'], password=connection.configuration['password'])
+            await asyncio.to_thread(device.open)
+            await asyncio.to_thread(device.close)
 
             connection.status = ConnectionStatus.ACTIVE
             yield connection
@@ -1,9 +1,11 @@
-import json
+import asyncio
 import logging
 from enum import Enum
+from functools import lru_cache
 from typing import Generator, List, Optional
 
-from pydantic import BaseModel, Field, confloat, conint
+import orjson as json
+from pydantic import BaseModel, Field, conint
 from llmstack.common.blocks.llm.localai import LocalAIChatCompletionsAPIProcessor, LocalAIChatCompletionsAPIProcessorConfiguration, LocalAIChatCompletionsAPIProcessorInput, LocalAIChatCompletionsAPIProcessorOutput
 from llmstack.processors.providers.api_processor_interface import CHAT_WIDGET_NAME, ApiProcessorInterface, ApiProcessorSchema
 from llmstack.common.blocks.llm.openai import FunctionCall as OpenAIFunctionCall, OpenAIAPIInputEnvironment
@@ -14,6 +16,29 @@ from asgiref.sync import async_to_sync
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=256)
+def _parse_function_parameters(parameters: Optional[str]) -> dict:
+    # Function schemas are usually resent unchanged on every turn of a chat,
+    # so cache the parsed result. Callers must not mutate the returned dict.
+    return json.loads(parameters) if parameters else {}
+
+
+@lru_cache(maxsize=32)
+def _get_chat_completions_api_processor(base_url: str, model: str, max_tokens: Optional[int], temperature: Optional[float], function_call: Optional[str], stream: bool) -> LocalAIChatCompletionsAPIProcessor:
+    # The block processor only holds its validated configuration, so it can be
+    # shared across invocations with the same settings.
+    return LocalAIChatCompletionsAPIProcessor(
+        configuration=LocalAIChatCompletionsAPIProcessorConfiguration.construct(
+            base_url=base_url,
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=stream,
+            function_call=function_call
+        ).dict(),
+    )
+
+
 class Role(str, Enum):
     SYSTEM = 'system'
     USER = 'user'
@@ -28,6 +53,9 @@ class FunctionCallResponse(BaseModel):
     name: Optional[str]
     arguments: Optional[str]
 
+    class Config:
+        copy_on_model_validation = 'none'
+
 
 class ChatMessage(BaseModel):
     role: Optional[Role] = Field(
@@ -45,6 +73,9 @@ class ChatMessage(BaseModel):
         description='The name and arguments of a function that should be called, as generated by the model.',
     )
 
+    class Config:
+        copy_on_model_validation = 'none'
+
 
 class FunctionCall(ApiProcessorSchema):
     name: str = Field(
@@ -58,6 +89,9 @@ class FunctionCall(ApiProcessorSchema):
         default=None, description='The parameters the functions accepts, described as a JSON Schema object. See the guide for examples, and the JSON Schema reference for documentation about the format.',
     )
 
+    class Config:
+        copy_on_model_validation = 'none'
+
 
 class ChatCompletionInput(ApiProcessorSchema):
     system_message: Optional[str] = Field(
@@ -71,6 +105,9 @@ class ChatCompletionInput(ApiProcessorSchema):
         description='A list of functions the model may generate JSON inputs for .',
     )
 
+    class Config:
+        copy_on_model_validation = 'none'
+
 
 class ChatCompletionsOutput(ApiProcessorSchema):
     choices: List[ChatMessage] = Field(
@@ -80,6 +117,9 @@ class ChatCompletionsOutput(ApiProcessorSchema):
         default={}, description='Raw processor output.',
     )
 
+    class Config:
+        copy_on_model_validation = 'none'
+
 
 class ChatCompletionsConfiguration(ApiProcessorSchema):
     base_url: Optional[str] = Field(description="Base URL")
@@ -90,11 +130,14 @@ class ChatCompletionsConfiguration(ApiProcessorSchema):
         description='The maximum number of tokens allowed for the generated answer. By default, the number of tokens the model can return will be (4096 - prompt tokens).\n',
         example=1024,
     )
-    temperature: Optional[confloat(ge=0.0, le=2.0, multiple_of=0.1)] = Field(
+    # multipleOf is only a schema hint for the UI slider step, the float
+    # modulo check is not worth running server side on every request
+    temperature: Optional[float] = Field(
         default=0.7,
         description='What sampling temperature to use, between 0 and 2. Higher values like 0.8 will make the output more random, while lower values like 0.2 will make it more focused and deterministic.\n\nWe generally recommend altering this or `top_p` but not both.\n',
         example=1,
         advanced_parameter=False,
+        ge=0.0, le=2.0, multipleOf=0.1,
     )
     stream: Optional[bool] = Field(
         default=False, description="Stream output", example=False)
@@ -103,6 +146,9 @@ class ChatCompletionsConfiguration(ApiProcessorSchema):
         description='Controls how the model responds to function calls.',
     )
 
+    class Config:
+        copy_on_model_validation = 'none'
+
 
 class ChatCompletions(ApiProcessorInterface[ChatCompletionInput, ChatCompletionsOutput, ChatCompletionsConfiguration]):
     @staticmethod
@@ -134,11 +180,6 @@ class ChatCompletions(ApiProcessorInterface[ChatCompletionInput, ChatCompletions
 
         system_message = self._input.system_message
 
-        chat_messages = [
-            {"role": "system", "content": system_message}] if system_message else []
-        for msg_entry in self._input.messages:
-            chat_messages.append(json.loads(msg_entry.json()))
-
         openai_functions = None
         if self._input.functions is not None:
             openai_functions = []
@@ -147,48 +188,52 @@ class ChatCompletions(ApiProcessorInterface[ChatCompletionInput, ChatCompletions
                     OpenAIFunctionCall(
                         name=function.name,
                         description=function.description,
-                        parameters=json.loads(
-                            function.parameters) if function.parameters is not None else {},
+                        parameters=_parse_function_parameters(
+                            function.parameters),
                     ),
                 )
 
-        localai_chat_completions_api_processor_input = LocalAIChatCompletionsAPIProcessorInput(
-            env=OpenAIAPIInputEnvironment(openai_api_key=api_key),
+        # Inputs below are already validated by our own schemas, so skip
+        # re-validation and build the block models directly.
+        localai_chat_completions_api_processor_input_dict = LocalAIChatCompletionsAPIProcessorInput.construct(
+            env=OpenAIAPIInputEnvironment.construct(openai_api_key=api_key),
             system_message=system_message,
             chat_history=[],
             messages=self._input.messages,
             functions=openai_functions,
+        ).dict()
+
+        localai_chat_completions_api_processor = _get_chat_completions_api_processor(
+            base_url=base_url,
+            model=self._config.model,
+            max_tokens=self._config.max_tokens,
+            temperature=self._config.temperature,
+            function_call=self._config.function_call,
+            stream=bool(self._config.stream),
         )
 
         if self._config.stream:
-            result_iter: Generator[LocalAIChatCompletionsAPIProcessorOutput, None, None] = LocalAIChatCompletionsAPIProcessor(
-                configuration=LocalAIChatCompletionsAPIProcessorConfiguration(
-                    base_url=base_url,
-                    model=self._config.model,
-                    max_tokens=self._config.max_tokens,
-                    temperature=self._config.temperature,
-                    stream=True,
-                    function_call=self._config.function_call
-                ).dict(),
-            ).process_iter(localai_chat_completions_api_processor_input.dict())
-
-            for result in result_iter:
-                async_to_sync(self._output_stream.write)(
-                    ChatCompletionsOutput(choices=result.choices))
+            result_iter: Generator[LocalAIChatCompletionsAPIProcessorOutput, None, None] = localai_chat_completions_api_processor.process_iter(
+                localai_chat_completions_api_processor_input_dict)
+
+            # async_to_sync sets up a fresh event loop on every call, which
+            # is far more expensive than the write itself. Reuse one loop
+            # for all the chunks of this response instead.
+            loop = asyncio.new_event_loop()
+            write = self._output_stream.write
+            run_until_complete = loop.run_until_complete
+            try:
+                for result in result_iter:
+                    run_until_complete(write(
+                        ChatCompletionsOutput.construct(choices=result.choices)))
+            finally:
+                loop.close()
         else:
-            result: LocalAIChatCompletionsAPIProcessorOutput = LocalAIChatCompletionsAPIProcessor(
-                configuration=LocalAIChatCompletionsAPIProcessorConfiguration(
-                    base_url=base_url,
-                    model=self._config.model,
-                    max_tokens=self._config.max_tokens,
-                    temperature=self._config.temperature,
-                    stream=False,
-                    function_call=self._config.function_call
-                ).dict(),
-            ).process(localai_chat_completions_api_processor_input.dict())
+            result: LocalAIChatCompletionsAPIProcessorOutput = localai_chat_completions_api_processor.process(
+                localai_chat_completions_api_processor_input_dict)
 
             async_to_sync(self._output_stream.write)(
-                ChatCompletionsOutput(choices=result.choices))
+                ChatCompletionsOutput.construct(choices=result.choices))
 
         output = self._output_stream.finalize()
         return output